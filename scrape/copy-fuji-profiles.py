@@ -1,7 +1,12 @@
+import copy
 import logging
 import os
+import threading
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
 
 from lxml import etree as ET
 from rich.console import Console
@@ -14,6 +19,23 @@ from scrape.models import FujiSensor
 BASE_PATH = os.path.expanduser("~/Library/Application Support/com.fujifilm.denji/X RAW STUDIO")
 FUJI_EXTENSION = ".FP1"
 
+# Tags copied from the reference profile into every template file
+DEFAULT_TAGS_TO_EXTRACT = (
+    "ConversionProfile",
+    "PropertyGroup",
+    "SerialNumber",
+    "TetherRAWConditonCode",
+    "Editable",
+    "SourceFileName",
+    "Fileerror",
+    "RotationAngle",
+    "StructVer",
+    "IOPCode",
+)
+
+# The two tags whose attributes (rather than text) are copied over
+_SPECIAL_TAGS = frozenset(("ConversionProfile", "PropertyGroup"))
+
 # Setup rich console and logging
 console = Console()
 logging.basicConfig(level="INFO", format="%(message)s", datefmt="[%X]", handlers=[RichHandler()])
@@ -60,15 +82,41 @@ COMPATIBILITY_MAPPING = {
 }
 
 
-# Value error subclasses
-class TagValidationError(ValueError):
-    def __init__(self, tag: str, attr: str = "") -> None:
-        if attr:
-            super().__init__(f"Missing or empty attribute '{attr}' in '{tag}'.")
-        else:
-            super().__init__(f"Missing '{tag}' in extracted tags.")
+# Parser contexts are reused across files to avoid a fresh libxml2
+# allocation per parse, but they aren't shareable between threads - the
+# template batch parses concurrently - so keep one per thread.
+_PARSER_STORE = threading.local()
+
 
+def _xml_parser() -> ET.XMLParser:
+    parser = getattr(_PARSER_STORE, "parser", None)
+    if parser is None:
+        parser = ET.XMLParser(remove_blank_text=True, collect_ids=False)
+        _PARSER_STORE.parser = parser
+    return parser
+
+
+@lru_cache(maxsize=8)
+def _union_xpath(tags: tuple) -> ET.XPath:
+    """
+    Compile one union expression that fetches every wanted element in a
+    single crossing into libxml2, in document order.
+    """
+    return ET.XPath(" | ".join(f"descendant-or-self::{tag}" for tag in tags))
 
+
+@lru_cache(maxsize=32)
+def _parse_cached(source_file_path: str, mtime_ns: int) -> ET._ElementTree:
+    """
+    Parse a file once per (path, mtime); repeated FP1File constructions for
+    the same unchanged source reuse the parse. Callers must deep-copy the
+    tree before mutating it.
+    """
+    with open(source_file_path, "rb", buffering=65536) as file:
+        return ET.parse(file, _xml_parser())
+
+
+# Value error subclasses
 class InvalidSelectionError(ValueError):
     def __init__(self) -> None:
         super().__init__("Invalid selection")
@@ -83,78 +131,128 @@ class NoValidFileError(ValueError):
 class FP1File:
     source_file_path: str
     destination_file_path: str = ""
-    xml_tree: ET._ElementTree = field(init=False)
-    tags_to_extract: list = field(
-        default_factory=lambda: [
-            "ConversionProfile",
-            "PropertyGroup",
-            "SerialNumber",
-            "TetherRAWConditonCode",
-            "Editable",
-            "SourceFileName",
-            "Fileerror",
-            "RotationAngle",
-            "StructVer",
-            "IOPCode",
-        ]
-    )
+    tags_to_extract: tuple = DEFAULT_TAGS_TO_EXTRACT
+    _xml_tree: ET._ElementTree | None = field(default=None, init=False, repr=False)
 
     def __post_init__(self) -> None:
         self.destination_file_path = self.destination_file_path if self.destination_file_path != "" else self.source_file_path
-        self.xml_tree = self._parse_xml()
+
+    @property
+    def xml_tree(self) -> ET._ElementTree:
+        # Parse lazily so discovery stays a pure filename filter and the
+        # parse happens inside whichever worker first touches the tree
+        if self._xml_tree is None:
+            self._xml_tree = self._parse_xml()
+        return self._xml_tree
+
+    @property
+    def _root(self) -> ET._Element:
+        return self.xml_tree.getroot()
 
     def _parse_xml(self) -> ET._ElementTree:
-        parser = ET.XMLParser(remove_blank_text=True)
-        with open(self.source_file_path, encoding="utf-8") as file:
-            return ET.parse(file, parser)
+        # Each FP1File mutates its own tree, so hand out a C-level clone of
+        # the cached parse; the mtime key invalidates edited sources. Copy
+        # the whole tree, not just the root, so the header comments in the
+        # prolog survive serialization.
+        source_stat = os.stat(self.source_file_path)
+        cached_tree = _parse_cached(self.source_file_path, source_stat.st_mtime_ns)
+        return copy.deepcopy(cached_tree)
 
     def extract_tags(self) -> dict:
-        root = self.xml_tree.getroot()
-        extracted_tags = {}
-        for tag in self.tags_to_extract:
-            if tag in self.required_attrs:
-                element = root if tag == "ConversionProfile" else root.find(f".//{tag}")
-                extracted_tags[tag] = element.attrib if element is not None else {}
+        extracted_tags: dict[str, Any] = {}
+
+        # One compiled union XPath hands back every wanted element from a
+        # single C-level traversal; the first occurrence of each tag wins,
+        # as find() did
+        for element in _union_xpath(self.tags_to_extract)(self._root):
+            tag = str(element.tag)
+            if tag in extracted_tags:
+                continue
+            if tag in _SPECIAL_TAGS:
+                extracted_tags[tag] = element.attrib
             else:
-                element = root.find(f".//{tag}")
-                extracted_tags[tag] = element.text.strip() if element is not None and element.text else ""
+                extracted_tags[tag] = element.text.strip() if element.text else ""
+
+        # Tags absent from the document keep their empty defaults
+        for tag in set(self.tags_to_extract).difference(extracted_tags):
+            extracted_tags[tag] = {} if tag in _SPECIAL_TAGS else ""
 
         return extracted_tags
 
-    @property
-    def required_attrs(self) -> dict:
-        return {
-            "ConversionProfile": ["application", "version"],
-            "PropertyGroup": ["device", "version"],
-        }
+    @classmethod
+    def extract_only(cls, file_path: str) -> dict:
+        """
+        Extract the interesting tags without building a full DOM.
+
+        Streams the file with iterparse and frees elements as they are
+        consumed, so probing a large destination folder never holds more
+        than a single element in memory. Returns an empty dict when none
+        of the wanted tags are present.
+        """
+        wanted = set(DEFAULT_TAGS_TO_EXTRACT)
+        extracted_tags: dict[str, Any] = {}
+
+        for event, element in ET.iterparse(file_path, events=("start", "end")):
+            tag = str(element.tag)
+            if event == "start":
+                # Attributes are already available on the start event
+                if tag in _SPECIAL_TAGS and tag not in extracted_tags:
+                    extracted_tags[tag] = dict(element.attrib)
+                continue
+
+            if tag in wanted and tag not in _SPECIAL_TAGS and tag not in extracted_tags:
+                extracted_tags[tag] = element.text.strip() if element.text else ""
+                if len(extracted_tags) == len(wanted):
+                    break  # Everything wanted has been seen; stop parsing
+
+            # Drop the element (and any already-consumed siblings) to keep
+            # the memory footprint flat
+            element.clear()
+            parent = element.getparent()
+            while element.getprevious() is not None and parent is not None:
+                del parent[0]
 
-    def apply_tags(self, master_tags: dict) -> None:
-        root = self.xml_tree.getroot()
+        return extracted_tags
 
-        for tag, value in master_tags.items():
-            if tag in ["ConversionProfile", "PropertyGroup"]:
+    def apply_tags(self, master_tags: dict) -> None:
+        remaining = dict(master_tags)
+        if not remaining:
+            return  # An empty union expression would not compile
+
+        # Same single C-level traversal as extract_tags; pop applied tags so
+        # only the first occurrence of each is touched
+        for element in _union_xpath(tuple(remaining))(self._root):
+            if not remaining:
+                break
+            tag = str(element.tag)
+            if tag not in remaining:
+                continue
+
+            value = remaining.pop(tag)
+            if tag in _SPECIAL_TAGS:
                 # Apply attributes to special tags
-                element = root if tag == "ConversionProfile" else root.find(f".//{tag}")
-
-                if element is not None:
-                    for attr, attr_value in value.items():
-                        # Skip label attribute
-                        if attr == "label":
-                            continue
-                        element.set(attr, attr_value)
+                for attr, attr_value in value.items():
+                    # Skip label attribute
+                    if attr == "label":
+                        continue
+                    element.set(attr, attr_value)
             else:
                 # Apply text content to regular tags
-                element = root.find(f".//{tag}")
-                if element is not None:
-                    element.text = value
-
-        # After modifying the tree, update xml_tree
-        self.xml_tree = ET.ElementTree(root)
+                element.text = value
 
     def save(self) -> None:
-        with open(self.destination_file_path, "wb") as file:
-            self.xml_tree.write(file, pretty_print=True, xml_declaration=True, encoding="UTF-8")
-            console.print(f"Saving {self.destination_file_path}", style="green")
+        # Serialize the tree in one shot and hand the bytes to the kernel in
+        # a single write. pretty_print would re-indent every element for
+        # output X RAW STUDIO never displays, so the compact form is kept.
+        data = ET.tostring(self.xml_tree, xml_declaration=True, encoding="UTF-8")
+        fd = os.open(self.destination_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        # Per-file console output is expensive on bulk runs; main() prints
+        # one summary line after the batch instead
+        logging.debug("Saved %s", self.destination_file_path)
 
 
 @dataclass
@@ -168,17 +266,20 @@ class FP1TemplateFiles:
         console.print(f"Found {self.total_number} valid {FUJI_EXTENSION} files found")
 
     def _generate_valid_files(self) -> list[FP1File]:
+        # Pure filename filter - the trees parse lazily inside the worker
+        # threads that apply and save them
         valid_files = []
-        for file_name in os.listdir(self.source_directory):
-            if file_name.upper().endswith(FUJI_EXTENSION):
-                valid_files.append(
-                    FP1File(
-                        source_file_path=os.path.join(self.source_directory, file_name),
-                        destination_file_path=os.path.join(self.destination_directory, file_name),
+        with os.scandir(self.source_directory) as entries:
+            for entry in entries:
+                if entry.name.upper().endswith(FUJI_EXTENSION):
+                    valid_files.append(
+                        FP1File(
+                            source_file_path=entry.path,
+                            destination_file_path=os.path.join(self.destination_directory, entry.name),
+                        )
                     )
-                )
-            else:
-                logging.warning(f"Invalid file format found: {file_name}")
+                else:
+                    logging.warning("Invalid file format found: %s", entry.name)
         return valid_files
 
     @property
@@ -187,12 +288,14 @@ class FP1TemplateFiles:
 
 
 def list_folders_with_subfolders(base_path: str) -> dict:
+    # scandir reads the entry type straight from the directory listing, so
+    # no extra stat call per child is needed
     folder_dict = {}
-    for item in os.listdir(base_path):
-        item_path = os.path.join(base_path, item)
-        if os.path.isdir(item_path):
-            subfolders = [f for f in os.listdir(item_path) if os.path.isdir(os.path.join(item_path, f))]
-            folder_dict[item] = subfolders
+    with os.scandir(base_path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                with os.scandir(entry.path) as sub_entries:
+                    folder_dict[entry.name] = [sub_entry.name for sub_entry in sub_entries if sub_entry.is_dir()]
     sorted_dict = OrderedDict(sorted(folder_dict.items()))
     return sorted_dict
 
@@ -217,13 +320,21 @@ def select_folder(folder_dict: dict) -> str:
     return options[int_choice]
 
 
-def find_valid_fp1_file(directory: str) -> FP1File | None:
-    for file_name in os.listdir(directory):
-        if file_name.endswith(FUJI_EXTENSION):
-            file_path = os.path.join(directory, file_name)
-            fp1_file = FP1File(file_path)
-            if fp1_file.extract_tags():
-                return fp1_file
+def find_valid_fp1_file(directory: str) -> tuple[FP1File, dict] | None:
+    """
+    Return the first valid FP1 file with its extracted tags, so the caller
+    doesn't have to walk the document a second time.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            valid_candidate = entry.is_file() and entry.name.endswith(FUJI_EXTENSION)
+            if not valid_candidate:
+                continue
+            # Probe with the streaming extractor; only the winning file
+            # gets a full DOM
+            extracted_tags = FP1File.extract_only(entry.path)
+            if extracted_tags:
+                return FP1File(entry.path), extracted_tags
     return None
 
 
@@ -278,19 +389,27 @@ if __name__ == "__main__":
 
     is_compatiable_sensor(selected_profile_folder, destination_path)
 
-    valid_fp1_file = find_valid_fp1_file(destination_path)
-    if not valid_fp1_file:
+    valid_reference = find_valid_fp1_file(destination_path)
+    if not valid_reference:
         raise NoValidFileError(FUJI_EXTENSION)
 
-    tags_to_apply = valid_fp1_file.extract_tags()
+    valid_fp1_file, tags_to_apply = valid_reference
     console.print(f"Tags to apply: {tags_to_apply}", style="bold yellow")
 
     if not os.path.exists(destination_path):
         os.makedirs(destination_path)
 
     fuji_template_files = FP1TemplateFiles(source_directory=fuji_profiles_path, destination_directory=destination_path)
-    for fp1_file in fuji_template_files.template_files:
+
+    def apply_and_save(fp1_file: FP1File) -> None:
         fp1_file.apply_tags(tags_to_apply)
         fp1_file.save()
 
+    # Each file owns its tree and destination, so the apply/serialize work
+    # parallelises without any locking
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        list(executor.map(apply_and_save, fuji_template_files.template_files))
+
+    console.print(f"Saved {fuji_template_files.total_number} profiles to {destination_path}", style="green", markup=False, highlight=False)
+
     logging.info("Files copied successfully.")
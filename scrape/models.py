@@ -75,6 +75,27 @@ class WhiteBalanceBlueRed(Enum):
     RED = "Red"
 
 
+# Plain dict caches for the enum lookups on the per-tag parsing hot path;
+# subscripting an Enum goes through EnumMeta.__getitem__, which is
+# measurably slower than a dict hit.
+_FUJI_EFFECTS = {member.name: member for member in FujiEffect}
+_FUJI_EFFECT_VALUES = {member.name: member.value for member in FujiEffect}
+_DYNAMIC_RANGE_VALUES = {member.name: member.value for member in DynamicRange}
+_FILM_SIMULATION_VALUES = {member.name: member.value for member in FilmSimulation}
+_GRAIN_EFFECT_SIZES = {member.name: member for member in GrainEffectSize}
+
+# White-balance strings pack the setting, colour temperature and red/blue
+# shifts into a single value; one alternation with named groups collects
+# them all in a single scan instead of a regex search per component.
+_WHITE_BALANCE_RE = re.compile(r"(?P<blue>[+-]?\d+)_BLUE|(?P<red>[+-]?\d+)_RED|(?P<temp>\d+)K|FLUORESCENT_(?P<fluorescent>\d)|^(?P<setting>[^_]+)")
+
+_FLUORESCENT_SETTINGS = {
+    "1": WhiteBalanceSetting.FLIGHT1,
+    "2": WhiteBalanceSetting.FLIGHT2,
+    "3": WhiteBalanceSetting.FLIGHT3,
+}
+
+
 @dataclass
 class GrainEffect:
     grain_effect: FujiEffect
@@ -154,7 +175,7 @@ class FujiSimulationProfile:
             if key in valid_fields:
                 filtered_data[key] = value
             else:
-                logging.warning(f"Invalid key '{key}' in data. This key will be ignored.")
+                logging.warning("Invalid key '%s' in data. This key will be ignored.", key)
 
         return cls(**filtered_data)
 
@@ -196,6 +217,13 @@ def clean_camera_profile_name(camera_tag: str) -> str:
     return camera_profile
 
 
+# Exposure compensation only ever uses thirds and whole stops, so the legal
+# strings can be tabulated upfront; the fraction arithmetic below is just a
+# fallback for anything unexpected.
+_EXPOSURE_COMPENSATION_TABLE: dict[str, float] = {f"{sign}{numerator}/3": round(float(f"{sign}{numerator}") / 3, 2) for sign in ("+", "-", "") for numerator in (1, 2, 4, 5)}
+_EXPOSURE_COMPENSATION_TABLE.update({f"{sign}{whole}": float(f"{sign}{whole}") for sign in ("+", "-", "") for whole in (0, 1, 2, 3)})
+
+
 def convert_to_float(value_str: str) -> float:
     """
     Converts a string to a float. Handles both regular numbers and fractions.
@@ -207,6 +235,10 @@ def convert_to_float(value_str: str) -> float:
     Returns:
     float: Rounded float value of the input string.
     """
+    table_value = _EXPOSURE_COMPENSATION_TABLE.get(value_str)
+    if table_value is not None:
+        return table_value
+
     if "/" in value_str:  # Fraction handling
         numerator, denominator = map(float, value_str.split("/"))
         return round(numerator / denominator, 2)
@@ -248,7 +280,7 @@ class KeyStandardizer:
 
     @staticmethod
     def color_chrome_effect(value: str) -> str:
-        return FujiEffect[value].value
+        return _FUJI_EFFECT_VALUES[value]
 
     @staticmethod
     def dynamic_range(value: str) -> str:
@@ -259,7 +291,7 @@ class KeyStandardizer:
             value = dynamic_range_map[value]
 
         try:
-            dynamic_range_value = DynamicRange[value].value
+            dynamic_range_value = _DYNAMIC_RANGE_VALUES[value]
         except KeyError:
             logging.warning("Could not parse dynamic range, setting to AUTO")
             dynamic_range_value = DynamicRange.DRAUTO.value
@@ -275,15 +307,15 @@ class KeyStandardizer:
     @staticmethod
     def film_simluation(value: str) -> str:
         camera_profile_value = clean_camera_profile_name(value)
-        return FilmSimulation[camera_profile_value].value
+        return _FILM_SIMULATION_VALUES[camera_profile_value]
 
     @staticmethod
     def grain_effect(value: str) -> GrainEffect:
         grain_effect_values = [item.strip() for item in value.split("_")]
 
         try:
-            grain_effect = FujiEffect[grain_effect_values[0]]  # Convert string to FujiEffect enum member
-            grain_effect_size = GrainEffectSize[grain_effect_values[1]] if len(grain_effect_values) > 1 else None  # Convert string to GrainEffectSize enum member or None
+            grain_effect = _FUJI_EFFECTS[grain_effect_values[0]]  # Convert string to FujiEffect enum member
+            grain_effect_size = _GRAIN_EFFECT_SIZES[grain_effect_values[1]] if len(grain_effect_values) > 1 else None  # Convert string to GrainEffectSize enum member or None
 
             return GrainEffect(grain_effect=grain_effect, grain_effect_size=grain_effect_size)
         except (IndexError, KeyError):
@@ -292,59 +324,26 @@ class KeyStandardizer:
 
     @staticmethod
     def white_balance(value: str) -> WhiteBalance:
-        def get_color_temperature(value: str) -> str:
-            """
-            Extracts the color temperature from the string
-            Defaults to 0K if no color temperature is found
-            """
-            temp_match = re.search(r"(\d+)K", value)
-            color_temp = int(temp_match.group(1)) if temp_match else None
-            color_temp_value = f"{color_temp}K" if color_temp else "0K"
-
-            return color_temp_value
-
-        def get_white_balance_setting(value: str) -> tuple[WhiteBalanceSetting, str]:
-            color_temp = get_color_temperature(value)
-
-            # Extract the temperature or setting
-            if "K" in value:
-                setting = WhiteBalanceSetting.TEMPERATURE
-            elif "AWB" in value:
-                setting = WhiteBalanceSetting.AUTO
-            else:
-                fluorescent_match = re.search(r"FLUORESCENT_(\d)", value)
-                if fluorescent_match:
-                    # Check if it's a fluorescent setting
-                    special_mappings = {
-                        "FLUORESCENT_1": WhiteBalanceSetting.FLIGHT1,
-                        "FLUORESCENT_2": WhiteBalanceSetting.FLIGHT2,
-                        "FLUORESCENT_3": WhiteBalanceSetting.FLIGHT3,
-                    }
-                    flight_number = fluorescent_match.group(1)
-                    setting = special_mappings[f"FLUORESCENT_{flight_number}"]
-                else:
-                    setting_match = re.match(r"([^_]+)", value)
-                    setting_name = setting_match.group(1).upper() if setting_match else "AUTO"
-                    setting = WhiteBalanceSetting[setting_name]
-
-            return setting, color_temp
-
-        def get_blue_red_numeric_value(value: str, blue_or_red: WhiteBalanceBlueRed) -> int:
-            "Extracts the blue or red (+-) integer value from the string"
-            numeric_red_blue_regex = {
-                WhiteBalanceBlueRed.BLUE: r"([+-]?\d+)_BLUE",
-                WhiteBalanceBlueRed.RED: r"([+-]?\d+)_RED",
-            }
-
-            related_regex = numeric_red_blue_regex[blue_or_red]
-            match = re.search(related_regex, value)
-            return int(match.group(1)) if match else 0
-
-        # Extract the blue and red values / color temperature
-        blue = get_blue_red_numeric_value(value, WhiteBalanceBlueRed.BLUE)
-        red = get_blue_red_numeric_value(value, WhiteBalanceBlueRed.RED)
-        # Defaults
-        setting, color_temp = get_white_balance_setting(value)
+        # Collect every component (first occurrence wins) in one pass
+        matches: dict[str, str] = {}
+        for match in _WHITE_BALANCE_RE.finditer(value):
+            group_name = match.lastgroup
+            if group_name and group_name not in matches:
+                matches[group_name] = match.group(group_name)
+
+        blue = int(matches["blue"]) if "blue" in matches else 0
+        red = int(matches["red"]) if "red" in matches else 0
+        # Defaults to 0K if no color temperature is found
+        color_temp = f"{matches['temp']}K" if "temp" in matches else "0K"
+
+        if "K" in value:
+            setting = WhiteBalanceSetting.TEMPERATURE
+        elif "AWB" in value:
+            setting = WhiteBalanceSetting.AUTO
+        elif "fluorescent" in matches:
+            setting = _FLUORESCENT_SETTINGS[matches["fluorescent"]]
+        else:
+            setting = WhiteBalanceSetting[matches.get("setting", "AUTO")]
 
         return WhiteBalance(setting=setting, red=red, blue=blue, color_temp=color_temp)
 
@@ -392,6 +391,9 @@ class KeyStandardizer:
 
     @classmethod
     def initialise_parsing_methods(cls) -> None:
+        if cls._parsing_methods:
+            return  # Already initialised
+
         cls._parsing_methods = {
             "color": KeyStandardizer.numerical_value,
             "color_chrome_effect": KeyStandardizer.color_chrome_effect,
@@ -406,3 +408,8 @@ class KeyStandardizer:
             "white_balance": KeyStandardizer.white_balance,
             "monochromatic_color": KeyStandardizer.monochromatic_color,
         }
+
+
+# Register the parsing methods once at import time; the guard above makes
+# any later explicit call a no-op.
+KeyStandardizer.initialise_parsing_methods()
@@ -1,14 +1,21 @@
+import atexit
 import logging
 import os
 import re
-from collections.abc import Generator
-from dataclasses import dataclass
-
-import requests
-from bs4 import BeautifulSoup
+import sys
+import tempfile
+from collections.abc import Generator, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import cache, cached_property, lru_cache
+from typing import ClassVar
+
+from bs4 import BeautifulSoup, SoupStrainer
 from bs4.element import Tag
 from jinja2 import Environment, FileSystemLoader, Template
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
+from requests_cache import CachedSession
 
 from scrape.models import FilmSimulation, FujiSensor, FujiSimulationProfile, KeyStandardizer, clean_camera_profile_name
 
@@ -17,79 +24,64 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(level
 
 logger = logging.getLogger(__name__)
 
+# One Environment for the process; Jinja compilation is expensive enough
+# that rebuilding the loader and re-parsing the template per recipe shows up
+_JINJA_ENV = Environment(loader=FileSystemLoader(os.getcwd()), autoescape=True)
 
-def fill_xml_template(profile_dict: dict, template: str) -> str:
-    """
-    Fills an XML template with values from a profile dictionary.
-
-    Args:
-    profile_dict (dict): Dictionary containing profile attributes and values.
-    template (str): XML template string to be filled with values.
-
-    Returns:
-    str: XML template filled with profile values.
-    """
-    # logger.info('Filling template with profile_dict: "%s"', profile_dict)
-    for attribute_name, attr_value in profile_dict.items():
-        if attr_value is None:
-            logger.info(f"Attribute '{attribute_name}' is None, skipping...")
-            continue
-        xml_tag = FujiSimulationProfile.attribute_to_xml_mapping.get(attribute_name, None)
 
-        if xml_tag:
-            template = replace_xml_value(template, xml_tag, attr_value)
-        else:
-            logging.warning(f"No XML tag mapping found for attribute '{attribute_name}'")
+@cache
+def _get_template(template_location: str) -> Template:
+    "Compile the template once and serve it from the cache afterwards"
+    return _JINJA_ENV.get_template(template_location)
 
-    return template
 
+@lru_cache(maxsize=256)
+def snake_to_camel(name: str) -> str:
+    components = name.split("_")
+    return "".join(x.title() for x in components)
 
-def replace_xml_value(template: str, attribute_name: str, attribute_value: str | int) -> str:
-    """
-    Replaces the value of a specific XML tag in a template.
 
-    Args:
-    template (str): XML template string.
-    attribute_name (str): The name of the XML tag to replace.
-    attribute_value (str): The new value to insert into the tag.
+# Matches everything clean_name strips: literal question marks plus any
+# non-ASCII character - one compiled pass instead of an encode/decode
+# round trip and a second replace
+_CLEAN_NAME_RE = re.compile("[?\u0080-\U0010ffff]")
 
-    Returns:
-    str: Updated XML template with the new value for the specified tag.
-    """
-    pattern = r"<" + re.escape(attribute_name) + r">(.*?)</" + re.escape(attribute_name) + r">"
 
-    if re.search(pattern, template):
-        return re.sub(pattern, f"<{attribute_name}>{attribute_value}</{attribute_name}>", template)
-    else:
-        logger.warning(f"Error: No XML tag found for attribute '{attribute_name}'")
-        return template
+# Special handling for some keys
+_SPECIAL_KEYS = {
+    "color_chrome_effect_blue": "color_chrome_fx_blue",
+    "grain": "grain_effect",
+    "noise_reduction": "high_iso_nr",
+    "sharpening": "sharpness",
+}
 
 
-def snake_to_camel(name: str) -> str:
-    components = name.split("_")
-    return "".join(x.title() for x in components)
+@lru_cache(maxsize=256)
+def _standardise_key_name(key_string: str) -> str:
+    # The same handful of keys recurs on every recipe page; memoise on the
+    # raw key and intern the result so downstream dict lookups compare by
+    # pointer rather than re-hashing a fresh string each time
+    clean_key_name = key_string.lower().replace(" ", "_").replace("&", "and")
+    return sys.intern(_SPECIAL_KEYS.get(clean_key_name, clean_key_name))
 
 
 @dataclass
 class FujiSimulationProfileParser:
     tags: list
 
-    @property
+    @cached_property
     def processed_tags(self) -> list[str]:
         "Return a list of tags with newlines removed and text stripped"
 
         def flatten_and_process_tags(tags: list[Tag]) -> Generator[str, None, None]:
             for tag in tags:
-                # Remove <a> tags but keep their text
-                for a in tag.find_all("a"):
-                    a.replace_with(a.get_text())
-
-                if tag.find("br"):
-                    tag_text = tag.get_text(separator="\n")
-                    for line in tag_text.split("\n"):
-                        yield line.strip()
-                else:
-                    yield tag.get_text().strip()
+                # Mark the line breaks; get_text() flattens anchor text on
+                # its own, so no per-<a> tree mutation is needed
+                for br in tag.find_all("br"):
+                    br.replace_with("\n")
+
+                for line in tag.get_text().split("\n"):
+                    yield line.strip()
 
         processed_tags = list(flatten_and_process_tags(self.tags))
 
@@ -98,21 +90,6 @@ class FujiSimulationProfileParser:
 
     @property
     def profile_dict(self) -> dict:
-        def standardise_key_names(key_string: str) -> str:
-            clean_key_name = key_string.lower().replace(" ", "_").replace("&", "and")
-            # Special handling for some keys
-            special_keys = {
-                "color_chrome_effect_blue": "color_chrome_fx_blue",
-                "grain": "grain_effect",
-                "noise_reduction": "high_iso_nr",
-                "sharpening": "sharpness",
-            }
-
-            if clean_key_name in special_keys:
-                return special_keys[clean_key_name]
-            else:
-                return clean_key_name
-
         profile_dict = {}
         for tag in self.processed_tags:
             try:
@@ -127,8 +104,7 @@ class FujiSimulationProfileParser:
                 else:
                     continue
 
-            KeyStandardizer.initialise_parsing_methods()
-            clean_key = standardise_key_names(key)
+            clean_key = _standardise_key_name(key)
             clean_value = KeyStandardizer.parse_key_and_standardise_value(clean_key, value)
             logger.debug("Parsing key '%s' with value '%s'", clean_key, clean_value)
             profile_dict[clean_key] = clean_value
@@ -148,38 +124,31 @@ class FujiSimulationProfileParser:
             return fuji_profile
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class FujiRecipeLink:
     name: str
     url: str
 
-    recipe_url_pattern: str = r"https?://fujixweekly\.com/\d{4}/\d{2}/\d{2}/.*recipe/$"
-
-    def __post_init__(self) -> None:
-        self.name = self.clean_name(self.name)
+    recipe_url_re: ClassVar[re.Pattern] = re.compile(r"https?://fujixweekly\.com/\d{4}/\d{2}/\d{2}/.*recipe/$")
 
-    def is_valid_recipe_link(self) -> bool:
-        # Check if the URL is None
-        if self.url is None:
-            return False
-
-        return bool(re.match(self.recipe_url_pattern, self.url))
+    @classmethod
+    def from_raw(cls, name: str, url: str) -> "FujiRecipeLink":
+        "Build a link from scraped anchor data, normalising the name"
+        return cls(name=cls.clean_name(name), url=url)
 
     @staticmethod
     def clean_name(name: str) -> str:
         """
-        Cleans the name by replacing non-ASCII characters.
+        Cleans the name by removing non-ASCII characters.
         """
-        # Encode to ASCII, replace non-ASCII characters with '?', then decode back
-        clean_name = name.encode("ascii", "replace").decode("ascii")
-        # Replace '?' with a desired character or remove it
-        clean_name = clean_name.replace("?", "")
-        return clean_name
+        return _CLEAN_NAME_RE.sub("", name)
 
     def parse_webpage_for_tags(self) -> list:
         logger.info("Parsing URL: %s", self.url)
-        page = requests.get(self.url, timeout=TIMEOUT_SECONDS)
-        soup = BeautifulSoup(page.content, "html.parser")
+        page = SESSION.get(self.url, timeout=TIMEOUT_SECONDS)
+        # Only the <strong> tags are consumed, so skip building the rest of
+        # the document tree
+        soup = BeautifulSoup(page.content, "lxml", parse_only=SoupStrainer("strong"))
         strong_tags = soup.find_all("strong")
         return strong_tags
 
@@ -191,20 +160,21 @@ class FujiRecipeLink:
             profile_parser_instance = FujiSimulationProfileParser(tags=tags)
             return profile_parser_instance.create_fuji_profile()
         except RequestException:
-            logger.exception(f"Error fetching URL {self.url}")
+            logger.exception("Error fetching URL %s", self.url)
             return None
         except Exception:
-            logger.exception(f"Error processing profile for {self.url}")
+            logger.exception("Error processing profile for %s", self.url)
             return None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class FujiRecipe:
     sensor: FujiSensor
     link: FujiRecipeLink
+    _profile: dict | None = field(default=None, init=False, repr=False, compare=False)
 
     # Defaults
-    template_location = "templates/FP1.jinja2"
+    template_location = "templates/fp1.jinja2"
 
     @property
     def output_file_path(self) -> str:
@@ -212,27 +182,31 @@ class FujiRecipe:
 
     @property
     def jinja2_template(self) -> Template:
-        "Returns a Jinja2 template object"
-        template_dir = os.getcwd()
-        file_loader = FileSystemLoader(template_dir)
-        env = Environment(loader=file_loader, autoescape=True)
-        template = env.get_template(self.template_location)
-        return template
+        "Returns the compiled Jinja2 template object"
+        return _get_template(self.template_location)
 
     @property
     def filled_template(self) -> str:
         "Returns a filled Jinja2 template as a string"
-        initial_filled_template = self.jinja2_template.render(self.link.__dict__)
-        filled_template = fill_xml_template(self.as_dict(), initial_filled_template) + "\n"
-        return filled_template
+        # Drop None values so their tags render empty rather than "None"
+        profile_values = {key: value for key, value in self.as_dict().items() if value is not None}
+        context = {"name": self.link.name, "url": self.link.url, **profile_values}
+        return self.jinja2_template.render(context) + "\n"
 
     def as_dict(self) -> dict:
-        fuji_profile = FujiRecipeLink(name=self.link.name, url=self.link.url).get_profile()
-        if isinstance(fuji_profile, FujiSimulationProfile):
-            return fuji_profile.to_flat_dict()
-        else:
-            logger.warning(f"Failed to get profile for {self.link.url}")
-            return {}
+        # Cache the parsed profile so filled_template and save share a
+        # single fetch per recipe instead of hitting the page twice
+        if self._profile is None:
+            fuji_profile = self.link.get_profile()
+            if isinstance(fuji_profile, FujiSimulationProfile):
+                profile_dict = fuji_profile.to_flat_dict()
+            else:
+                logger.warning("Failed to get profile for %s", self.link.url)
+                profile_dict = {}
+            # Frozen dataclass, so store the memo directly
+            object.__setattr__(self, "_profile", profile_dict)
+
+        return self._profile or {}
 
     def save(self) -> bool:
         try:
@@ -240,18 +214,26 @@ class FujiRecipe:
 
             if fuji_profile:
                 output = self.filled_template
-                # Create the directory if it doesn't exist
-                directory_path = os.path.dirname(self.output_file_path)
-                os.makedirs(directory_path, exist_ok=True)
+
+                try:
+                    with open(self.output_file_path) as existing_file:
+                        existing_output = existing_file.read()
+                except FileNotFoundError:
+                    existing_output = None
+
+                if existing_output == output:
+                    logger.info('Recipe "%s" is unchanged, skipping write', self.link.name)
+                    return True
+
                 logger.info('Saving recipe "%s"', self.link.name)
 
-                with open(self.output_file_path, "w") as f:
+                with open(self.output_file_path, "w", buffering=65536) as f:
                     f.write(output)
-                logger.info(f"Profile saved successfully to {self.output_file_path}")
+                logger.info("Profile saved successfully to %s", self.output_file_path)
                 return True
 
         except Exception:
-            logger.exception(f"Failed to save profile for {self.link.url}")
+            logger.exception("Failed to save profile for %s", self.link.url)
 
         return False
 
@@ -263,44 +245,53 @@ class FujiRecipes:
     related_recipes: list[FujiRecipe]  # Assuming FujiRecipe is defined somewhere
 
     @staticmethod
+    @lru_cache(maxsize=16)
     def soup_representation(url: str) -> BeautifulSoup:
-        page = requests.get(url, timeout=TIMEOUT_SECONDS)
-        soup = BeautifulSoup(page.content, "html.parser")
+        # Memoised per process so fetch_recipes and max_recipes share one
+        # parse of the same sensor index page; only the anchors are ever
+        # queried, so don't materialise anything else
+        page = SESSION.get(url, timeout=TIMEOUT_SECONDS)
+        soup = BeautifulSoup(page.content, "lxml", parse_only=SoupStrainer("a"))
         return soup
 
-    @classmethod
-    def max_recipes(cls, sensor_url: str) -> int:
-        soup = cls.soup_representation(sensor_url)
-        recipe_links = soup.find_all("a", href=re.compile(FujiRecipeLink.recipe_url_pattern))
-        return len(recipe_links)
+    @staticmethod
+    def max_recipes(soup: BeautifulSoup) -> int:
+        "Count every recipe link on an already-parsed sensor index page"
+        return len(soup.find_all("a", href=FujiRecipeLink.recipe_url_re))
 
     @classmethod
     def fetch_recipes(cls, sensor: FujiSensor, sensor_url: str) -> list[FujiRecipe]:
         soup = cls.soup_representation(sensor_url)
-        all_links_for_sensor = soup.find_all("a")
+
+        # Recipe links sit between the "#content" skip-link and the social
+        # links at the bottom of the page. Let the parser pre-filter the
+        # anchors by href instead of wrapping (and rejecting) every <a>.
+        content_anchor = soup.find("a", href="#content")
+        recipe_anchors = content_anchor.find_all_next("a", href=FujiRecipeLink.recipe_url_re) if isinstance(content_anchor, Tag) else soup.find_all("a", href=FujiRecipeLink.recipe_url_re)
+
+        twitter_anchor = soup.find("a", href=lambda href: bool(href) and "twitter" in href)
+        footer_anchor_ids = {id(anchor) for anchor in twitter_anchor.find_all_next("a", href=FujiRecipeLink.recipe_url_re)} if isinstance(twitter_anchor, Tag) else set()
 
         related_recipes = []
-        collect_recipes = False
+        seen_urls: set[str] = set()
 
-        for link in all_links_for_sensor:
-            link_object = FujiRecipeLink(url=link.get("href"), name=link.text)
-            href = link_object.url
-            if href == "#content":
-                collect_recipes = True  # Start collecting recipes
-                continue
-            elif "twitter" in href:
+        for anchor in recipe_anchors:
+            if id(anchor) in footer_anchor_ids:
                 break  # Stop collecting recipes
+            if not isinstance(anchor, Tag):
+                continue
 
-            if collect_recipes and link_object.is_valid_recipe_link():
-                sensor_recipe = FujiRecipe(sensor=sensor, link=link_object)
-                if sensor_recipe in related_recipes:
-                    logger.warning(f"Recipe {sensor_recipe.link.name} already fetched.")
-                else:
-                    related_recipes.append(sensor_recipe)
+            link_object = FujiRecipeLink.from_raw(url=str(anchor["href"]), name=anchor.text)
+            if link_object.url in seen_urls:
+                logger.warning("Recipe %s already fetched.", link_object.name)
+            else:
+                seen_urls.add(link_object.url)
+                related_recipes.append(FujiRecipe(sensor=sensor, link=link_object))
 
-        # Validation Step
-        if len(related_recipes) > cls.max_recipes(sensor_url):
-            logger.warning(f"More recipes fetched ({len(related_recipes)}) than the expected maximum.")
+        # Validation Step - reuse the soup already in hand rather than
+        # fetching and parsing the index a second time
+        if len(related_recipes) > cls.max_recipes(soup):
+            logger.warning("More recipes fetched (%s) than the expected maximum.", len(related_recipes))
         return related_recipes
 
 
@@ -316,47 +307,58 @@ GLOBAL_SENSOR_LIST: dict[FujiSensor, str] = {
 }
 
 TIMEOUT_SECONDS = 10
+MAX_WORKER_THREADS = 16
+HTTP_CACHE_EXPIRE_SECONDS = 60 * 60 * 24 * 7
+
+# Recipe pages rarely change once published, so answer repeat runs from an
+# on-disk cache instead of refetching every page from the network. Every
+# request targets the same host, so keep the pooled connections alive
+# across fetches rather than renegotiating TCP + TLS per page.
+SESSION = CachedSession("fuji_http_cache", backend="sqlite", expire_after=HTTP_CACHE_EXPIRE_SECONDS, cache_control=True)
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+SESSION.headers["User-Agent"] = "fuji-x-weekly-simulation-profiles/0.1 (https://github.com/namtonthat/fuji-x-weekly-simulation-profiles)"
+atexit.register(SESSION.close)
 
 
 def get_cached_url_file_path(sensor: FujiSensor) -> str:
     return f"cached/{sensor.value}.txt"
 
 
-def create_cached_urls_file(sensor: FujiSensor) -> None:
-    file_path = get_cached_url_file_path(sensor)
-
-    # Check if the directory exists, create it if it doesn't
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-    with open(file_path, "w") as f:
-        f.write("")
-
-
-def read_cached_urls(sensor: FujiSensor) -> list[str]:
+def read_cached_urls(sensor: FujiSensor) -> set[str]:
     "Read the cached URLs from a file"
     try:
         file_path = get_cached_url_file_path(sensor)
         with open(file_path) as f:
-            cached_urls = f.readlines()
+            return {line.strip() for line in f if line.strip()}
     except FileNotFoundError:
-        return []
-    return cached_urls
+        return set()
 
 
-def write_cached_urls(sensor: FujiSensor, urls: list[str]) -> None:
-    "Write the cached URLs to a file"
+def write_cached_urls(sensor: FujiSensor, urls: Iterable[str]) -> None:
+    "Write the cached URLs to a file, sorted for stable diffs"
     file_path = get_cached_url_file_path(sensor)
-    if not os.path.exists(file_path):
-        create_cached_urls_file(sensor)
+    directory_path = os.path.dirname(file_path)
+    os.makedirs(directory_path, exist_ok=True)
+
+    sorted_urls = sorted(urls)
+    logger.info("Writing %s URLs to %s", len(sorted_urls), file_path)
 
-    with open(file_path, "w") as f:
-        logger.info("Writing %s URLs to %s", len(urls), file_path)
-        f.writelines([url + "\n" for url in urls])
+    # Write to a sibling temp file and swap it in, so an interrupted run
+    # can't leave a truncated cache behind
+    with tempfile.NamedTemporaryFile("w", dir=directory_path, delete=False) as f:
+        f.writelines([url + "\n" for url in sorted_urls])
+        temp_path = f.name
+    os.replace(temp_path, file_path)
 
 
 if __name__ == "__main__":
     sensor_recipes: dict[FujiSensor, list[FujiRecipe]] = {}
 
+    # Create the per-sensor output directories once up front rather than
+    # re-checking them for every saved recipe
+    for sensor in GLOBAL_SENSOR_LIST:
+        os.makedirs(f"fuji_profiles/{sensor.value}", exist_ok=True)
+
     # Iterate through each sensors home page and fetch the recipes
     for sensor, sensor_url in GLOBAL_SENSOR_LIST.items():
         logger.info("Pulling recipes for sensor %s", sensor)
@@ -372,15 +374,19 @@ if __name__ == "__main__":
     for sensor_type, related_recipes in sensor_recipes.items():
         cached_sensor_urls = read_cached_urls(sensor_type)
 
-        new_urls = []
+        pending_recipes = []
         for recipe in related_recipes:
             if recipe.link.url in cached_sensor_urls:
-                logger.info(f"Recipe {recipe.link.name} has previously been saved.")
+                logger.info("Recipe %s has previously been saved.", recipe.link.name)
                 continue
+            pending_recipes.append(recipe)
+
+        # The work is network-bound, so overlap the per-recipe round-trips;
+        # the session's adapter pool is thread-safe and sized to match
+        with ThreadPoolExecutor(max_workers=MAX_WORKER_THREADS) as executor:
+            save_results = list(executor.map(FujiRecipe.save, pending_recipes))
 
-            recipe_saved_successfully = recipe.save()
-            if recipe_saved_successfully:
-                new_urls.append(recipe.link.url)
+        new_urls = [recipe.link.url for recipe, saved in zip(pending_recipes, save_results, strict=True) if saved]
 
-        new_cached_urls = cached_sensor_urls + new_urls
-        write_cached_urls(sensor_type, new_cached_urls)
+        cached_sensor_urls.update(new_urls)
+        write_cached_urls(sensor_type, cached_sensor_urls)